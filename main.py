@@ -1,5 +1,16 @@
 # src/agent_creator/main.py
-import uvicorn
+import os
 
 if __name__ == "__main__":
-    uvicorn.run("agent_creator.api.api:app", host="0.0.0.0", port=8000, reload=True)
+    import uvicorn
+
+    uvicorn.run(
+        "agent_creator.api.api:app",
+        host="0.0.0.0",
+        port=8000,
+        # "auto" picks uvloop/httptools when installed (uvicorn[standard]) and
+        # falls back to asyncio/h11 where they aren't, e.g. on Windows.
+        loop="auto",
+        http="auto",
+        workers=os.cpu_count(),
+    )
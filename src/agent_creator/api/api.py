@@ -1,23 +1,57 @@
 # src/my_project/api/api.py
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from .db_handler import init_db
+from . import db
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import meta_agent, crews
-from .services.crew_service import load_all_crews_from_db
 
-app = FastAPI()
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # or ["*"] for dev
-    allow_credentials=True,
-    allow_methods=["*"],    # critical to allow OPTIONS, POST, etc.
-    allow_headers=["*"],
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from .services.crew_service import load_all_crews_from_db
+    # The pool and db token live on app.state, so each app has its own;
+    # the in-memory crews, the /crews cache and the /jobs single-flight map
+    # are still process-wide. init_db only creates what is missing, and
+    # rehydration rebuilds the in-memory crews.
+    app.state.db_token = await asyncio.to_thread(init_db)
+    app.state.pool = db.open_pool()
+    # Crews are rehydrated in the background so the server starts accepting
+    # requests right away; /ready reports when they are loaded.
+    app.state.load_task = asyncio.create_task(asyncio.to_thread(load_all_crews_from_db))
+    yield
+    app.state.load_task.cancel()
+    await db.close_pool(app.state.pool)
 
-app.include_router(meta_agent.router, prefix="/meta-agent", tags=["meta-agent"])
-app.include_router(crews.router, tags=["crews"])
+def create_app() -> FastAPI:
+    # Routers (and the CrewAI stack behind meta_agent) are imported only
+    # when an app is actually built.
+    from .routers import meta_agent, crews
 
-@app.on_event("startup")
-def startup_event():
-    init_db()
-    load_all_crews_from_db()
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+    # Any local dev-server port; preflights are cached by the browser for a
+    # day. In production CORS can be answered by the reverse proxy instead.
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origin_regex=r"^http://localhost:\d+$",
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "DELETE"],
+        allow_headers=["content-type", "authorization"],
+        max_age=86400,
+    )
+
+    app.include_router(meta_agent.router, prefix="/meta-agent", tags=["meta-agent"])
+    app.include_router(crews.router, tags=["crews"])
+
+    @app.get("/ready")
+    async def ready(request: Request):
+        load_task = request.app.state.load_task
+        if not load_task.done():
+            raise HTTPException(status_code=503, detail="Loading crews")
+        if load_task.exception():
+            raise HTTPException(status_code=503, detail=f"Loading crews failed: {load_task.exception()}")
+        return {"status": "ready"}
+
+    return app
+
+app = create_app()
@@ -0,0 +1,60 @@
+# src/my_project/api/db.py
+import asyncio
+import aiosqlite
+from aiosqlitepool import SQLiteConnectionPool
+from fastapi import Depends, Request
+
+from . import db_handler
+from .db_handler import PRAGMAS, CACHED_STATEMENTS, ISOLATION_LEVEL
+
+POOL_SIZE = 8
+
+# How long close_pool waits to run PRAGMA optimize (including for a free
+# connection) before shutting down without it
+OPTIMIZE_TIMEOUT = 1
+
+async def connection_factory() -> aiosqlite.Connection:
+    # DB_PATH is looked up on every connect, so db_handler stays the one
+    # place it is set
+    conn = await aiosqlite.connect(db_handler.DB_PATH, cached_statements=CACHED_STATEMENTS,
+                                   isolation_level=ISOLATION_LEVEL)
+    for pragma in PRAGMAS:
+        await conn.execute(pragma)
+    return conn
+
+def open_pool() -> SQLiteConnectionPool:
+    """
+    Opens a connection pool. The app lifespan keeps it on app.state.pool,
+    so every app, and every request it serves, uses a pool of its own.
+    """
+    return SQLiteConnectionPool(connection_factory, pool_size=POOL_SIZE)
+
+async def _optimize(pool: SQLiteConnectionPool):
+    async with pool.connection() as conn:
+        await conn.execute("PRAGMA optimize")
+
+async def close_pool(pool: SQLiteConnectionPool):
+    try:
+        # Lets SQLite refresh planner statistics for tables whose indexes
+        # got used heavily since the last ANALYZE. Best effort, and bounded:
+        # at shutdown every connection may still be checked out, and the
+        # pool would wait out its 30s acquisition timeout for one.
+        await asyncio.wait_for(_optimize(pool), timeout=OPTIMIZE_TIMEOUT)
+    except Exception:
+        pass
+    finally:
+        await pool.close()
+
+def get_pool(request: Request) -> SQLiteConnectionPool:
+    """
+    FastAPI dependency: the pool of the app serving the request.
+    """
+    return request.app.state.pool
+
+async def get_conn(pool: SQLiteConnectionPool = Depends(get_pool)):
+    """
+    FastAPI dependency: borrows a long-lived connection from the pool
+    for the duration of the request.
+    """
+    async with pool.connection() as conn:
+        yield conn
@@ -1,13 +1,122 @@
 # src/my_project/api/db_handler.py
 
 import sqlite3
-import json
+import aiosqlite
+import orjson
 import os
+import time
+import uuid
 
 DB_PATH = os.environ.get("DB_PATH", "crews.db")
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
+# Applied to every connection (sync and pooled). Apart from journal_mode,
+# which is stored in the database file, PRAGMAs are per-connection.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",   # 256 MiB
+    "PRAGMA cache_size=-64000",     # ~64 MB page cache
+    "PRAGMA wal_autocheckpoint=1000",
+)
+
+# Per-connection LRU of prepared statements (sqlite3 default is 128)
+CACHED_STATEMENTS = 256
+
+# Autocommit: single statements commit on their own, and multi-statement
+# writes open their transaction explicitly with BEGIN IMMEDIATE so the
+# write lock is taken up front instead of on a deferred upgrade.
+ISOLATION_LEVEL = None
+
+_INSERT_CREW_SQL = """
+    INSERT INTO crew_metadata (crew_name, process, input_schema_json, planning, manager_llm,
+                               user_memory, user_cache, user_knowledge, user_human_input_tasks)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    RETURNING crew_id
+"""
+
+# Agents and tasks are each bound once as a JSON array and fanned out by
+# json_each, so one statement inserts every row.
+# json_quote keeps llm/tools/context_tasks as JSON text.
+_INSERT_AGENT_SQL = """
+    INSERT INTO agent (crew_id, name, role, goal, llm, tools_json, memory, cache)
+    SELECT ?,
+           json_extract(value, '$.name'),
+           json_extract(value, '$.role'),
+           json_extract(value, '$.goal'),
+           json_quote(json_extract(value, '$.llm')),
+           json_quote(json_extract(value, '$.tools')),
+           json_extract(value, '$.memory'),
+           json_extract(value, '$.cache')
+    FROM json_each(?)
+"""
+
+_INSERT_TASK_SQL = """
+    INSERT INTO task (crew_id, name, description, expected_output,
+                      agent_name, human_input, context_tasks)
+    SELECT ?,
+           json_extract(value, '$.name'),
+           json_extract(value, '$.description'),
+           json_extract(value, '$.expected_output'),
+           json_extract(value, '$.agent'),
+           json_extract(value, '$.human_input'),
+           json_quote(json_extract(value, '$.context_tasks'))
+    FROM json_each(?)
+"""
+
+# Crew metadata plus its agents and tasks (as JSON arrays) in one row;
+# shared by the crews router and crew_service, decoded by crew_config_from_row.
+# Agents and tasks are aggregated from subqueries ordered by their ids so the
+# arrays keep saved order (task order is execution order for sequential
+# crews) whatever plan SQLite picks; ORDER BY inside json_group_array needs
+# SQLite 3.44+.
+_CREW_COLUMNS = """
+           cm.crew_name, cm.process, cm.input_schema_json, cm.planning, cm.manager_llm,
+           cm.user_memory, cm.user_cache, cm.user_knowledge, cm.user_human_input_tasks, cm.is_active,
+           (SELECT json_group_array(json_object(
+                       'name', name, 'role', role, 'goal', goal, 'llm', llm,
+                       'tools', json(tools_json), 'memory', memory, 'cache', cache))
+            FROM (SELECT * FROM agent WHERE crew_id = cm.crew_id ORDER BY agent_id)),
+           (SELECT json_group_array(json_object(
+                       'name', name, 'description', description, 'expected_output', expected_output,
+                       'agent', agent_name, 'human_input', human_input,
+                       'context_tasks', json(context_tasks)))
+            FROM (SELECT * FROM task WHERE crew_id = cm.crew_id ORDER BY task_id))
+"""
+
+GET_CREW_SQL = f"SELECT {_CREW_COLUMNS} FROM crew_metadata cm WHERE cm.crew_id=?"
+
+# Every crew at once, each row prefixed with its crew_id (startup rehydration)
+ALL_CREWS_SQL = f"SELECT cm.crew_id, {_CREW_COLUMNS} FROM crew_metadata cm ORDER BY cm.crew_id"
+
+INTERRUPTED_JOB_ERROR = "Interrupted: the server stopped before the job finished"
+
+# Identifies this process as the owner of the jobs it accepts. A job only
+# runs inside the process that accepted it (a BackgroundTasks callback),
+# which refreshes the job's updated_at every JOB_HEARTBEAT seconds while it
+# is unfinished.
+BOOT_ID = uuid.uuid4().hex
+JOB_HEARTBEAT = 10
+# An unfinished job of another process that has gone this long without a
+# heartbeat was cut off by a restart, crash or shutdown.
+JOB_STALE_AFTER = 6 * JOB_HEARTBEAT
+
+def connect() -> sqlite3.Connection:
+    """
+    Opens a sync sqlite3 connection with PRAGMAS applied.
+    """
+    conn = sqlite3.connect(DB_PATH, cached_statements=CACHED_STATEMENTS,
+                           isolation_level=ISOLATION_LEVEL)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def init_db() -> str:
+    """
+    Creates whatever tables, indexes and triggers are missing and returns
+    the database's token (see db_instance below).
+    """
+    conn = connect()
     c = conn.cursor()
     c.execute("""
     CREATE TABLE IF NOT EXISTS crew_metadata(
@@ -49,19 +158,54 @@ def init_db():
         context_tasks TEXT
     );
     """)
-    conn.commit()
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS job(
+        job_id TEXT PRIMARY KEY,
+        status TEXT,
+        crew_id INTEGER,
+        error TEXT,
+        owner TEXT,
+        updated_at REAL
+    );
+    """)
+    # get_crew / delete_crew filter agents and tasks by crew_id. The index
+    # ends in the rowid (agent_id/task_id), so a crew's rows also come back
+    # in id order without a sort.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_agent_crew ON agent(crew_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_task_crew ON task(crew_id)")
+    # Deleting a crew removes its agents and tasks inside SQLite. A trigger
+    # rather than ON DELETE CASCADE, so databases created before this
+    # existed get the same behaviour (SQLite can't add FKs to a table).
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS crew_metadata_delete_children
+    AFTER DELETE ON crew_metadata
+    BEGIN
+        DELETE FROM agent WHERE crew_id = OLD.crew_id;
+        DELETE FROM task WHERE crew_id = OLD.crew_id;
+    END;
+    """)
+    # A random token for this database file, written once. ETags include it:
+    # crew ids only identify content within one file, and a recreated
+    # crews.db (or another DB_PATH) starts them over at 1.
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS db_instance(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        token TEXT NOT NULL
+    );
+    """)
+    c.execute("INSERT OR IGNORE INTO db_instance (id, token) VALUES (1, ?)", (uuid.uuid4().hex,))
+    (token,) = c.execute("SELECT token FROM db_instance").fetchone()
     conn.close()
+    return token
 
-def save_crew_config(config: dict):
+async def save_crew_config(conn: aiosqlite.Connection, config: dict) -> int:
     """
-    Persists the final config into the DB.
+    Persists the final config into the DB on the given (pooled) connection
+    and returns the new crew_id.
     'human_input' remains a boolean, but if the final JSON has a dictionary
     in 'human_input', we move it to a sub-field (e.g. input_fields) and set
     'human_input' = True.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
     crew_data = config.get('crew', {})
     input_schema = config.get('input_schema_json', {})
     agents = config.get('agents', [])
@@ -76,55 +220,35 @@ def save_crew_config(config: dict):
     user_knowledge = crew_data.get("user_knowledge", False)
     user_human_input_tasks = crew_data.get("user_human_input_tasks", False)
 
-    # Validate each task's agent is in the 'agents' list
+    # Validate each task's agent is in the 'agents' list; every offending task
+    # is reported at once (a missing agent is never in agent_names either)
     agent_names = {agent.get("name") for agent in agents if agent.get("name")}
-    for task in tasks:
-        task_agent = task.get("agent")
-        if not task_agent:
-            raise ValueError(
-                f"Task '{task.get('name','<unnamed>')}' has no 'agent' field."
-            )
-        if task_agent not in agent_names:
-            raise ValueError(
-                f"Task '{task.get('name','<unnamed>')}' references agent '{task_agent}', "
-                "which is not present in the 'agents' list."
-            )
-
-    # Insert into crew_metadata (note we JSON-serialize manager_llm)
-    c.execute("""
-    INSERT INTO crew_metadata (crew_name, process, input_schema_json, planning, manager_llm,
-                               user_memory, user_cache, user_knowledge, user_human_input_tasks)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        crew_name,
-        process,
-        json.dumps(input_schema),
-        planning,
-        json.dumps(manager_llm),  # safe even if manager_llm is None/dict/string
-        user_memory,
-        user_cache,
-        user_knowledge,
-        user_human_input_tasks
-    ))
-    crew_id = c.lastrowid
-
-    # Insert agents
-    for agent in agents:
-        c.execute("""
-        INSERT INTO agent (crew_id, name, role, goal, llm, tools_json, memory, cache)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            crew_id,
-            agent.get("name"),
-            agent.get("role"),
-            agent.get("goal"),
-            json.dumps(agent.get("llm")),
-            json.dumps(agent.get("tools", [])),
-            agent.get("memory", False),
-            agent.get("cache", False)
+    bad_tasks = [task for task in tasks if task.get("agent") not in agent_names]
+    if bad_tasks:
+        raise ValueError(" ".join(
+            f"Task '{task.get('name','<unnamed>')}' has no 'agent' field."
+            if not task.get("agent") else
+            f"Task '{task.get('name','<unnamed>')}' references agent '{task['agent']}', "
+            "which is not present in the 'agents' list."
+            for task in bad_tasks
         ))
 
-    # Insert tasks
+    # Build agent rows (crew_id is filled in once the crew row exists)
+    agent_rows = [
+        {
+            "name": agent.get("name"),
+            "role": agent.get("role"),
+            "goal": agent.get("goal"),
+            "llm": agent.get("llm"),
+            "tools": agent.get("tools", []),
+            "memory": agent.get("memory", False),
+            "cache": agent.get("cache", False)
+        }
+        for agent in agents
+    ]
+
+    # Build task rows
+    task_rows = []
     for task in tasks:
         # Step 1: retrieve 'human_input'
         hi_value = task.get("human_input", False)
@@ -146,19 +270,127 @@ def save_crew_config(config: dict):
             # You can store it in context. Up to you. We'll nest it as 'input_fields'
             context_list.append({"input_fields": input_fields_dict})
 
-        c.execute("""
-        INSERT INTO task (crew_id, name, description, expected_output,
-                          agent_name, human_input, context_tasks)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            crew_id,
-            task.get("name"),
-            task.get("description"),
-            task.get("expected_output"),
-            task.get("agent"),
-            hi_bool,                  # only True/False
-            json.dumps(context_list)  # store as JSON
+        task_rows.append({
+            "name": task.get("name"),
+            "description": task.get("description"),
+            "expected_output": task.get("expected_output"),
+            "agent": task.get("agent"),
+            "human_input": hi_bool,         # only True/False
+            "context_tasks": context_list   # stored as JSON by SQLite
+        })
+
+    # One transaction for the crew and all of its agents/tasks
+    await conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Insert into crew_metadata (note we JSON-serialize manager_llm)
+        # RETURNING (SQLite >= 3.35) hands back the new id with the insert
+        ((crew_id,),) = await conn.execute_fetchall(_INSERT_CREW_SQL, (
+            crew_name,
+            process,
+            orjson.dumps(input_schema).decode(),
+            planning,
+            orjson.dumps(manager_llm).decode(),  # safe even if manager_llm is None/dict/string
+            user_memory,
+            user_cache,
+            user_knowledge,
+            user_human_input_tasks
         ))
 
-    conn.commit()
-    conn.close()
+        await conn.execute(_INSERT_AGENT_SQL, (crew_id, orjson.dumps(agent_rows).decode()))
+        await conn.execute(_INSERT_TASK_SQL, (crew_id, orjson.dumps(task_rows).decode()))
+    except Exception:
+        await conn.execute("ROLLBACK")
+        raise
+    await conn.execute("COMMIT")
+    return crew_id
+
+def crew_config_from_row(crew_row) -> dict:
+    """
+    Turns a GET_CREW_SQL row into the crew config dict served by the API
+    and used to rebuild in-memory crews.
+    """
+    (crew_name, process, input_schema_json, planning, manager_llm,
+     user_memory, user_cache, user_knowledge, user_human_input_tasks, is_active,
+     agents_json, tasks_json) = crew_row
+
+    agents = orjson.loads(agents_json)
+    for agent in agents:
+        agent["tools"] = agent["tools"] or []
+        agent["memory"] = bool(agent["memory"])
+        agent["cache"] = bool(agent["cache"])
+        agent["backstory"] = ""  # if needed, or fetch from a column if you stored backstory
+
+    tasks = orjson.loads(tasks_json)
+    for task in tasks:
+        task["human_input"] = bool(task["human_input"])
+        task["context_tasks"] = task["context_tasks"] or []
+
+    # Construct final schema-like JSON
+    crew_data = {
+        "crew": {
+            "name": crew_name if crew_name else "",
+            "process": process if process else "",
+            "planning": bool(planning),
+            "manager_llm": manager_llm,
+            "user_memory": bool(user_memory),
+            "user_cache": bool(user_cache),
+            "user_knowledge": bool(user_knowledge),
+            "user_human_input_tasks": bool(user_human_input_tasks)
+        },
+        "agents": agents,
+        "tasks": tasks,
+        "input_schema_json": {} if not input_schema_json else orjson.loads(input_schema_json)
+    }
+    return crew_data
+
+async def create_job(conn: aiosqlite.Connection) -> str:
+    """
+    Registers a pending crew-generation job, owned by this process, and
+    returns its id.
+    """
+    job_id = uuid.uuid4().hex
+    await conn.execute(
+        "INSERT INTO job (job_id, status, owner, updated_at) VALUES (?, 'pending', ?, ?)",
+        (job_id, BOOT_ID, time.time())
+    )
+    return job_id
+
+async def update_job(conn: aiosqlite.Connection, job_id: str, status: str,
+                     crew_id: int = None, error: str = None):
+    await conn.execute(
+        "UPDATE job SET status=?, crew_id=?, error=?, updated_at=? WHERE job_id=?",
+        (status, crew_id, error, time.time(), job_id)
+    )
+
+async def touch_job(conn: aiosqlite.Connection, job_id: str):
+    """
+    Heartbeat: records that the owning process is still working on the job.
+    """
+    await conn.execute("UPDATE job SET updated_at=? WHERE job_id=?", (time.time(), job_id))
+
+_GET_JOB_SQL = "SELECT job_id, status, crew_id, error, owner, updated_at FROM job WHERE job_id=?"
+
+async def get_job(conn: aiosqlite.Connection, job_id: str) -> dict:
+    """
+    Returns the job, or None. An unfinished job whose owner stopped
+    heartbeating is failed first (with INTERRUPTED_JOB_ERROR), so pollers
+    stop waiting; this process's own jobs are always live.
+    Only that case writes: polls otherwise never wait for the write lock.
+    """
+    c = await conn.execute(_GET_JOB_SQL, (job_id,))
+    row = await c.fetchone()
+    if not row:
+        return None
+    stale_before = time.time() - JOB_STALE_AFTER
+    if row[1] in ("pending", "running") and row[4] != BOOT_ID and row[5] < stale_before:
+        # Guarded again, in case the owner finished or beat since the read
+        await conn.execute(
+            """
+            UPDATE job SET status='failed', error=?
+            WHERE job_id=? AND status IN ('pending', 'running') AND updated_at < ?
+            """,
+            (INTERRUPTED_JOB_ERROR, job_id, stale_before)
+        )
+        c = await conn.execute(_GET_JOB_SQL, (job_id,))
+        row = await c.fetchone()
+    return {"job_id": row[0], "status": row[1], "crew_id": row[2], "error": row[3]}
@@ -1,128 +1,96 @@
 # src/my_project/api/routers/crews.py
-from fastapi import APIRouter, HTTPException
-import sqlite3
-import os
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+import aiosqlite
+from ..db import get_conn
+from ..db_handler import GET_CREW_SQL, crew_config_from_row
 
-DB_PATH = os.environ.get("DB_PATH", "crews.db")
 router = APIRouter()
 
-@router.get("/crews", response_model=List[Dict[str, Any]])
-def list_crews():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT crew_id, crew_name, process, manager_llm, is_active FROM crew_metadata ORDER BY crew_id ASC")
-    rows = c.fetchall()
-    conn.close()
+# The whole /crews payload, rendered as a JSON array by SQLite
+_LIST_CREWS_SQL = """
+    SELECT json_group_array(json_object(
+               'crew_id', crew_id,
+               'crew_name', coalesce(crew_name, ''),
+               'process', coalesce(process, ''),
+               'manager_llm', manager_llm,
+               'is_active', json(CASE WHEN is_active THEN 'true' ELSE 'false' END)))
+    FROM (SELECT * FROM crew_metadata ORDER BY crew_id ASC)
+"""
 
-    crews = []
-    for row in rows:
-        crew_id, crew_name, process, manager_llm, is_active = row
-        crews.append({
-            "crew_id": crew_id,
-            "crew_name": crew_name if crew_name else "",
-            "process": process if process else "",
-            "manager_llm": manager_llm,
-            "is_active": bool(is_active)
-        })
-    return crews
+# Crews are only ever inserted (AUTOINCREMENT ids) or deleted, so the row
+# count plus the highest id changes whenever the list does - including
+# writes made by save_crew_config or by another worker process. Prefixed
+# with the database token, since another database can have the same pair.
+_CREWS_VERSION_SQL = "SELECT count(*), coalesce(max(crew_id), 0) FROM crew_metadata"
 
-@router.get("/crews/{crew_id}", response_model=Dict[str, Any])
-def get_crew(crew_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+_crews_cache = None  # (version, JSON bytes) from the last full list_crews read
 
-    # Get crew metadata
-    c.execute("""
-        SELECT crew_name, process, input_schema_json, planning, manager_llm, user_memory, user_cache, user_knowledge, user_human_input_tasks, is_active
-        FROM crew_metadata
-        WHERE crew_id=?
-    """, (crew_id,))
-    crew_row = c.fetchone()
-    if not crew_row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Crew not found")
+# Lets the frontend's repeated GETs reuse a response for a second, then
+# revalidate with If-None-Match.
+_CACHE_CONTROL = "private, max-age=1"
+
+_CREW_EXISTS_SQL = "SELECT 1 FROM crew_metadata WHERE crew_id=?"
 
-    (crew_name, process, input_schema_json, planning, manager_llm,
-     user_memory, user_cache, user_knowledge, user_human_input_tasks, is_active) = crew_row
 
-    # Get agents
-    c.execute("""
-        SELECT name, role, goal, llm, tools_json, memory, cache
-        FROM agent
-        WHERE crew_id=?
-    """, (crew_id,))
-    agent_rows = c.fetchall()
-    agents = []
-    for (name, role, goal, llm, tools_json, memory, cache) in agent_rows:
-        agents.append({
-            "name": name,
-            "role": role,
-            "goal": goal,
-            "llm": llm,
-            "tools": [] if tools_json is None else (eval(tools_json) if tools_json else []),
-            "memory": bool(memory),
-            "cache": bool(cache),
-            "backstory": ""  # if needed, or fetch from a column if you stored backstory
-        })
+@router.get("/crews")
+async def list_crews(request: Request, conn: aiosqlite.Connection = Depends(get_conn)):
+    global _crews_cache
 
-    # Get tasks
-    c.execute("""
-        SELECT name, description, expected_output, agent_name, human_input, context_tasks
-        FROM task
-        WHERE crew_id=?
-    """, (crew_id,))
-    task_rows = c.fetchall()
-    tasks = []
-    for (name, description, expected_output, agent_name, human_input, context_tasks) in task_rows:
-        context_list = eval(context_tasks) if context_tasks else []
-        tasks.append({
-            "name": name,
-            "description": description,
-            "expected_output": expected_output,
-            "agent": agent_name,
-            "human_input": bool(human_input),
-            "context_tasks": context_list
-        })
+    # One read transaction, so the version and the payload come from the
+    # same WAL snapshot: a crew committed between two autocommit reads would
+    # otherwise be cached under the older version, and served again once a
+    # delete brings the table back to it.
+    await conn.execute("BEGIN")
+    try:
+        c = await conn.execute(_CREWS_VERSION_SQL)
+        count, max_id = await c.fetchone()
+        version = f"{request.app.state.db_token}-{count}-{max_id}"
+        etag = f'W/"{version}"'
+        headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
 
-    conn.close()
+        if _crews_cache is None or _crews_cache[0] != version:
+            c = await conn.execute(_LIST_CREWS_SQL)
+            (crews_json,) = await c.fetchone()
+            _crews_cache = (version, crews_json.encode())
+        body = _crews_cache[1]
+    finally:
+        await conn.execute("COMMIT")
 
-    # Construct final schema-like JSON
-    crew_data = {
-        "crew": {
-            "name": crew_name if crew_name else "",
-            "process": process if process else "",
-            "planning": bool(planning),
-            "manager_llm": manager_llm,
-            "user_memory": bool(user_memory),
-            "user_cache": bool(user_cache),
-            "user_knowledge": bool(user_knowledge),
-            "user_human_input_tasks": bool(user_human_input_tasks)
-        },
-        "agents": agents,
-        "tasks": tasks,
-        "input_schema_json": {} if not input_schema_json else eval(input_schema_json)
-    }
-    return crew_data
+    return Response(content=body, media_type="application/json",
+                    headers=headers)
 
-@router.delete("/crews/{crew_id}", response_model=Dict[str, Any])
-def delete_crew(crew_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+@router.get("/crews/{crew_id}")
+async def get_crew(crew_id: int, request: Request, response: Response,
+                   conn: aiosqlite.Connection = Depends(get_conn)):
+    # A saved crew is never modified, only deleted, and AUTOINCREMENT ids are
+    # never reused within a database - so the database token plus the id
+    # identifies its content. A revalidation only has to confirm the crew
+    # still exists.
+    etag = f'W/"{request.app.state.db_token}-crew-{crew_id}"'
+    headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        c = await conn.execute(_CREW_EXISTS_SQL, (crew_id,))
+        if await c.fetchone():
+            return Response(status_code=304, headers=headers)
 
-    # Check if crew exists
-    c.execute("SELECT crew_id FROM crew_metadata WHERE crew_id=?", (crew_id,))
-    if not c.fetchone():
-        conn.close()
+    c = await conn.execute(GET_CREW_SQL, (crew_id,))
+    crew_row = await c.fetchone()
+    if not crew_row:
         raise HTTPException(status_code=404, detail="Crew not found")
 
-    # Delete agents
-    c.execute("DELETE FROM agent WHERE crew_id=?", (crew_id,))
-    # Delete tasks
-    c.execute("DELETE FROM task WHERE crew_id=?", (crew_id,))
-    # Delete crew metadata
-    c.execute("DELETE FROM crew_metadata WHERE crew_id=?", (crew_id,))
+    response.headers.update(headers)
+    return crew_config_from_row(crew_row)
 
-    conn.commit()
-    conn.close()
+@router.delete("/crews/{crew_id}")
+async def delete_crew(crew_id: int, conn: aiosqlite.Connection = Depends(get_conn)):
+    # Delete and existence check in one statement (SQLite >= 3.35), which
+    # commits on its own on the autocommit connection; agents and tasks go
+    # with it (crew_metadata_delete_children trigger)
+    deleted = await conn.execute_fetchall(
+        "DELETE FROM crew_metadata WHERE crew_id=? RETURNING crew_id", (crew_id,)
+    )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Crew not found")
     return {"status": "success", "message": f"Crew {crew_id} deleted successfully"}
@@ -1,21 +1,39 @@
 # src/my_project/api/routers/meta_agent.py
 
-import json
-from fastapi import APIRouter, HTTPException
+import asyncio
+import hashlib
+import aiosqlite
+import orjson
+from aiosqlitepool import SQLiteConnectionPool
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from ..schemas import MetaAgentInput
-from src.agent_creator.crew import MetaCrew
-from ..db_handler import save_crew_config
+from src.agent_creator.crew import get_meta_crew, normalize_inputs
+from ..db import get_conn, get_pool
+from ..db_handler import (save_crew_config, create_job, update_job, touch_job, get_job,
+                          JOB_HEARTBEAT)
 
 router = APIRouter()
 
-@router.post("/create_crew")
-def create_crew(input: MetaAgentInput):
-    # 1) Run the meta-crew to generate final_config
-    meta_crew_instance = MetaCrew()
-    result = meta_crew_instance.crew().kickoff(inputs=input.dict())
+# Single-flight for /jobs: identical requests submitted while a matching job
+# is still generating share that job (and its LLM run) instead of starting
+# another one. Entries are dropped as soon as the job finishes.
+# The map lives in this process only: with several uvicorn workers (main.py),
+# duplicates that land on different workers are not coalesced.
+_inflight_lock = asyncio.Lock()
+_inflight_jobs = {}  # request key -> job_id
+
+def _generate_crew_config(inputs: dict) -> dict:
+    """
+    Runs the meta-crew on the dumped MetaAgentInput and returns the
+    validated final config.
+    Raises HTTPException(400) if the generated agents/tasks don't line up.
+    Blocking (LLM calls): run it via asyncio.to_thread from async routes.
+    """
+    # 1) Run (a copy of) the shared meta-crew to generate final_config
+    result = get_meta_crew().crew().copy().kickoff(inputs=inputs)
 
     # 2) Extract final config as dict
-    final_config = result.pydantic.dict() if result.pydantic else result.raw
+    final_config = result.pydantic.model_dump() if result.pydantic else result.raw
 
     # 3) Ensure 'agents' and 'tasks' exist (fallback to empty lists)
     if final_config.get("agents") is None:
@@ -27,38 +45,107 @@ def create_crew(input: MetaAgentInput):
     # 4) Validation snippet
     # ------------------
 
+    # Every problem is collected and reported in a single 400
+    errors = []
+
     # (a) Make sure each agent has a 'name'
-    for agent in final_config["agents"]:
-        if not agent.get("name"):
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    f"Agent with role='{agent.get('role','<no role>')}' "
-                    "is missing the 'name' field. Please ensure 'name' is populated."
-                )
-            )
+    errors.extend(
+        f"Agent with role='{agent.get('role','<no role>')}' "
+        "is missing the 'name' field. Please ensure 'name' is populated."
+        for agent in final_config["agents"] if not agent.get("name")
+    )
 
     # Collect agent names in a set
-    agent_names = {agent["name"] for agent in final_config["agents"]}
+    agent_names = {agent["name"] for agent in final_config["agents"] if agent.get("name")}
 
     # (b) Ensure each task.agent references a valid agent name
     for task in final_config["tasks"]:
-        if not task.get("agent"):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Task '{task.get('name','<unnamed>')}' is missing 'agent' field."
-            )
-        if task["agent"] not in agent_names:
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    f"Task '{task.get('name','<unnamed>')}' references agent '{task['agent']}' "
-                    f"which is not in the agent 'name' list: {sorted(agent_names)}"
-                )
+        task_agent = task.get("agent")
+        if not task_agent:
+            errors.append(f"Task '{task.get('name','<unnamed>')}' is missing 'agent' field.")
+        elif task_agent not in agent_names:
+            errors.append(
+                f"Task '{task.get('name','<unnamed>')}' references agent '{task_agent}' "
+                f"which is not in the agent 'name' list: {sorted(agent_names)}"
             )
 
-    # ------------------
-    # 5) Save the validated config
-    # ------------------
-    save_crew_config(final_config)
+    if errors:
+        raise HTTPException(status_code=400, detail=" ".join(errors))
+
+    return final_config
+
+@router.post("/create_crew")
+async def create_crew(input: MetaAgentInput, pool: SQLiteConnectionPool = Depends(get_pool)):
+    final_config = await asyncio.to_thread(_generate_crew_config, input.model_dump())
+
+    # Save the validated config. The connection is borrowed only for the save:
+    # holding a pooled one across the LLM run would starve every DB route.
+    async with pool.connection() as conn:
+        await save_crew_config(conn, final_config)
     return {"status": "success", "config": final_config}
+
+def _request_key(inputs: dict) -> str:
+    # Normalized exactly as the prompts are, so equal prompts mean equal keys
+    data = normalize_inputs(inputs)
+    return hashlib.blake2b(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+async def _heartbeat(pool: SQLiteConnectionPool, job_id: str):
+    # Keeps the job's updated_at fresh so other workers' get_job never takes
+    # it for one cut off by a restart
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT)
+        try:
+            async with pool.connection() as conn:
+                await touch_job(conn, job_id)
+        except Exception:
+            pass  # a missed beat is retried on the next one
+
+async def _run_create_crew_job(pool: SQLiteConnectionPool, job_id: str, inputs: dict, key: str):
+    # Runs after the response is sent, so it borrows pooled connections of its
+    # own - and only around the DB writes, not for the length of the LLM run.
+    # Everything is inside the try so the single-flight entry is always
+    # released, even if marking the job running fails.
+    heartbeat = asyncio.create_task(_heartbeat(pool, job_id))
+    try:
+        async with pool.connection() as conn:
+            await update_job(conn, job_id, "running")
+        final_config = await asyncio.to_thread(_generate_crew_config, inputs)
+        async with pool.connection() as conn:
+            crew_id = await save_crew_config(conn, final_config)
+            await update_job(conn, job_id, "done", crew_id=crew_id)
+    except Exception as exc:
+        async with pool.connection() as conn:
+            await update_job(conn, job_id, "failed", error=str(getattr(exc, "detail", exc)))
+    finally:
+        heartbeat.cancel()
+        _inflight_jobs.pop(key, None)
+
+@router.post("/jobs", status_code=202)
+async def create_crew_job(input: MetaAgentInput, background_tasks: BackgroundTasks,
+                          pool: SQLiteConnectionPool = Depends(get_pool),
+                          conn: aiosqlite.Connection = Depends(get_conn)):
+    """
+    Same as /create_crew, but returns immediately with a job id; the meta-crew
+    runs in the background. Poll GET /jobs/{job_id} until status is
+    'done' (crew_id is set) or 'failed' (error is set).
+    An identical request already in flight returns that job's id instead.
+    """
+    inputs = input.model_dump()
+    key = _request_key(inputs)
+    # Held across create_job's await so two identical requests can't both miss
+    async with _inflight_lock:
+        job_id = _inflight_jobs.get(key)
+        if job_id is None:
+            job_id = await create_job(conn)
+            _inflight_jobs[key] = job_id
+            background_tasks.add_task(_run_create_crew_job, pool, job_id, inputs, key)
+            return {"job_id": job_id, "status": "pending"}
+    job = await get_job(conn, job_id)
+    return {"job_id": job_id, "status": job["status"]}
+
+@router.get("/jobs/{job_id}")
+async def get_crew_job(job_id: str, conn: aiosqlite.Connection = Depends(get_conn)):
+    job = await get_job(conn, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
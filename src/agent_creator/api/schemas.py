@@ -1,8 +1,11 @@
 # src/my_project/api/schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
 
 class MetaAgentInput(BaseModel):
+    # Request bodies are read-only once validated
+    model_config = ConfigDict(frozen=True)
+
     user_description: str
     user_input_description: str
     user_output_description: str
@@ -16,6 +19,8 @@ class MetaAgentInput(BaseModel):
     user_manager_llm: Optional[str] = None
 
 class CrewConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     crew: Dict[str, Any]
     agents: List[Dict[str, Any]]
     tasks: List[Dict[str, Any]]
@@ -1,6 +1,7 @@
 # src/agent_creator/crew.py
 
-from typing import Any, Dict, List, Optional, Union
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 from crewai import Agent, Crew, Process, Task, LLM
 from crewai.project import CrewBase, agent, task, crew, before_kickoff
@@ -114,6 +115,17 @@ class PlanRefinementFeedback(BaseModel):
     needs_refinement: bool = Field(..., description="Whether the plan needs further refinement")
     recommended_algorithm: str = Field(default="same", description="Recommended algorithm for refinement (same, best_of_n, tot, rebase)")
 
+def normalize_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns inputs with the order-insensitive user_tools list sorted and
+    de-duplicated. Both the prompts (MetaCrew.capture_inputs) and the /jobs
+    single-flight key go through here, so requests that render the same
+    prompts always share a key.
+    """
+    if isinstance(inputs.get("user_tools"), (list, tuple)):
+        inputs = {**inputs, "user_tools": sorted(set(inputs["user_tools"]))}
+    return inputs
+
 @CrewBase
 class MetaCrew():
     def __init__(self, 
@@ -126,7 +138,6 @@ class MetaCrew():
         self.llm_model = llm_model
         # Set verbose=False to reduce debug logs
         self.llm = LLM(model=self.llm_model, temperature=0.2, verbose=False)
-        self.inputs: Dict[str, Any] = {}
         # PlanGEN parameters
         self.n_samples = n_samples  # Number of plans to generate for Best-of-N
         self.use_best_of_n = use_best_of_n  # Whether to use Best-of-N sampling
@@ -139,11 +150,15 @@ class MetaCrew():
     @before_kickoff
     def capture_inputs(self, inputs: Dict[str, Any]):
         """
-        Store user inputs in self.inputs so placeholders like {user_description}
-        get replaced by CrewAI's .format(**inputs) at runtime.
+        Return the inputs CrewAI uses to fill placeholders like {user_description}
+        via .format(**inputs) at runtime. Nothing is stored on self, since one
+        MetaCrew is shared by concurrent runs (see get_meta_crew).
+
+        The tool list is normalized (normalize_inputs), so equal requests
+        render byte-identical prompts and reuse the provider's prompt-prefix
+        cache.
         """
-        self.inputs = inputs
-        return inputs
+        return normalize_inputs(inputs)
 
     @agent
     def planner_agent(self) -> Agent:
@@ -1014,4 +1029,16 @@ Start with "CrewConfig(" and include all necessary fields.
             # Update the result with the refined plan
             # Again, this is simplified - we would need to integrate this with the actual result
             
-        return initial_result
\ No newline at end of file
+        return initial_result
+
+@lru_cache(maxsize=8)
+def get_meta_crew(llm_model: str = "openai/gpt-4") -> MetaCrew:
+    """
+    Shared MetaCrew per model, so the LLM client, agents and tasks are built
+    once per process instead of per request. Run it as
+    get_meta_crew().crew().copy().kickoff(...) - like CrewAI's kickoff_for_each,
+    each run gets its own copy of the agents and tasks.
+    """
+    meta_crew = MetaCrew(llm_model=llm_model)
+    meta_crew.crew()  # build (and memoize) the crew up front
+    return meta_crew
@@ -0,0 +1,19 @@
+# tests/conftest.py
+import pytest
+
+from agent_creator.api import db_handler
+from agent_creator.api.routers import crews
+
+from helpers import make_client
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "crews.db")
+    monkeypatch.setattr(db_handler, "DB_PATH", path)
+    monkeypatch.setattr(crews, "_crews_cache", None)
+    return path
+
+@pytest.fixture
+def client(db_path):
+    with make_client((crews.router, "")) as client:
+        yield client
@@ -0,0 +1,102 @@
+# tests/helpers.py
+import copy
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agent_creator.api import db, db_handler
+
+# Two agents saved in reverse name order, and tasks whose agents are too,
+# so any accidental re-sorting on read shows up.
+CREW_CONFIG = {
+    "crew": {
+        "name": "Research crew",
+        "process": "sequential",
+        "planning": False,
+        "manager_llm": {"model": "openai/gpt-4"},
+        "user_memory": True,
+        "user_cache": False,
+        "user_knowledge": False,
+        "user_human_input_tasks": True,
+    },
+    "input_schema_json": {"topic": {"type": "string"}},
+    "agents": [
+        {"name": "writer", "role": "Writer", "goal": "Write", "llm": "openai/gpt-4",
+         "tools": ["search", "scrape"], "memory": True, "cache": False},
+        {"name": "analyst", "role": "Analyst", "goal": "Analyse", "llm": None,
+         "memory": False, "cache": True},
+    ],
+    "tasks": [
+        {"name": "draft", "description": "Draft it", "expected_output": "A draft",
+         "agent": "writer", "human_input": {"tone": "formal"}, "context_tasks": ["outline"]},
+        {"name": "review", "description": "Review it", "expected_output": "Notes",
+         "agent": "analyst", "human_input": False},
+    ],
+}
+
+class _Output:
+    def __init__(self, config):
+        self.config = config
+
+    def model_dump(self):
+        return copy.deepcopy(self.config)
+
+class _Result:
+    def __init__(self, config):
+        self.pydantic = _Output(config)
+        self.raw = ""
+
+class FakeMetaCrew:
+    """
+    Stands in for get_meta_crew(): .crew().copy().kickoff() returns config.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.kickoffs = 0
+
+    def crew(self):
+        return self
+
+    def copy(self):
+        return self
+
+    def kickoff(self, inputs):
+        self.kickoffs += 1
+        return _Result(self.config)
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    app.state.db_token = db_handler.init_db()
+    app.state.pool = db.open_pool()
+    yield
+    await db.close_pool(app.state.pool)
+
+def make_client(*routers) -> TestClient:
+    """
+    Builds a bare app around (router, prefix) pairs, with the database
+    initialized and the pool opened and closed the way the real lifespan
+    does.
+    """
+    app = FastAPI(lifespan=_lifespan)
+    for router, prefix in routers:
+        app.include_router(router, prefix=prefix)
+    return TestClient(app)
+
+def save(client: TestClient, config: dict = CREW_CONFIG) -> int:
+    """
+    Saves a crew on a pooled connection from inside the app's event loop.
+    """
+    async def run():
+        async with client.app.state.pool.connection() as conn:
+            return await db_handler.save_crew_config(conn, copy.deepcopy(config))
+    return client.portal.call(run)
+
+def remove_db(path: str):
+    """
+    Deletes a database file along with any WAL/shared-memory files.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
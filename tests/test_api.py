@@ -0,0 +1,71 @@
+# tests/test_api.py
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("crewai")
+
+from agent_creator.api import api, db_handler
+from agent_creator.api.services import crew_service
+
+from helpers import make_client, save
+
+def wait_for_load(client: TestClient):
+    async def run():
+        await asyncio.wait([client.app.state.load_task])
+    client.portal.call(run)
+
+def test_ready_reports_503_until_crews_are_loaded(db_path, monkeypatch):
+    loaded = threading.Event()
+    monkeypatch.setattr(crew_service, "load_all_crews_from_db", lambda: loaded.wait(5))
+
+    with TestClient(api.create_app()) as client:
+        r = client.get("/ready")
+        assert r.status_code == 503
+        assert r.json()["detail"] == "Loading crews"
+        # Requests are served while crews load
+        assert client.get("/crews").json() == []
+
+        loaded.set()
+        wait_for_load(client)
+        r = client.get("/ready")
+        assert r.status_code == 200
+        assert r.json() == {"status": "ready"}
+
+def test_ready_reports_a_failed_load(db_path, monkeypatch):
+    def fail():
+        raise RuntimeError("boom")
+    monkeypatch.setattr(crew_service, "load_all_crews_from_db", fail)
+
+    with TestClient(api.create_app()) as client:
+        wait_for_load(client)
+        r = client.get("/ready")
+        assert r.status_code == 503
+        assert r.json()["detail"] == "Loading crews failed: boom"
+
+def test_lifespan_opens_and_closes_the_apps_database(db_path, monkeypatch):
+    monkeypatch.setattr(crew_service, "load_all_crews_from_db", lambda: None)
+
+    app = api.create_app()
+    with TestClient(app) as client:
+        assert app.state.db_token
+        assert client.get("/crews").status_code == 200
+    assert app.state.pool._pool.is_closed
+
+def test_rehydration_reads_the_current_db_path(tmp_path, db_path, monkeypatch):
+    monkeypatch.setattr(crew_service, "build_crew_from_config", lambda config: config["crew"]["name"])
+    monkeypatch.setattr(crew_service, "in_memory_crews", {})
+    with make_client() as client:
+        crew_id = save(client)
+    crew_service.load_all_crews_from_db()
+    assert crew_service.in_memory_crews == {crew_id: "Research crew"}
+
+    # Same thread, another database: it must be read, not the first one
+    monkeypatch.setattr(db_handler, "DB_PATH", str(tmp_path / "other.db"))
+    monkeypatch.setattr(crew_service, "in_memory_crews", {})
+    with make_client():  # creates the empty tables
+        pass
+    crew_service.load_all_crews_from_db()
+    assert crew_service.in_memory_crews == {}
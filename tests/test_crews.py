@@ -0,0 +1,198 @@
+# tests/test_crews.py
+import shutil
+import sqlite3
+from pathlib import Path
+
+from fastapi import Depends
+
+from agent_creator.api import db_handler
+from agent_creator.api.db import get_conn, get_pool
+from agent_creator.api.routers import crews
+
+from helpers import CREW_CONFIG, make_client, remove_db, save
+
+# The checked-in database: created before the delete trigger and indexes
+REPO_DB = Path(__file__).resolve().parent.parent / "crews.db"
+
+# CREW_CONFIG as GET /crews/{crew_id} serves it
+EXPECTED_CREW = {
+    "crew": {
+        "name": "Research crew",
+        "process": "sequential",
+        "planning": False,
+        "manager_llm": '{"model":"openai/gpt-4"}',
+        "user_memory": True,
+        "user_cache": False,
+        "user_knowledge": False,
+        "user_human_input_tasks": True,
+    },
+    "agents": [
+        {"name": "writer", "role": "Writer", "goal": "Write", "llm": '"openai/gpt-4"',
+         "tools": ["search", "scrape"], "memory": True, "cache": False, "backstory": ""},
+        {"name": "analyst", "role": "Analyst", "goal": "Analyse", "llm": "null",
+         "tools": [], "memory": False, "cache": True, "backstory": ""},
+    ],
+    "tasks": [
+        {"name": "draft", "description": "Draft it", "expected_output": "A draft",
+         "agent": "writer", "human_input": True,
+         "context_tasks": ["outline", {"input_fields": {"tone": "formal"}}]},
+        {"name": "review", "description": "Review it", "expected_output": "Notes",
+         "agent": "analyst", "human_input": False, "context_tasks": []},
+    ],
+    "input_schema_json": {"topic": {"type": "string"}},
+}
+
+def test_get_crew_round_trips_saved_config_in_order(client):
+    crew_id = save(client)
+
+    r = client.get(f"/crews/{crew_id}")
+    assert r.status_code == 200
+    assert r.json() == EXPECTED_CREW
+
+def test_get_crew_404s_for_unknown_crew(client):
+    assert client.get("/crews/1").status_code == 404
+
+def test_all_crews_query_matches_get_crew(client):
+    first, second = save(client), save(client)
+
+    conn = db_handler.connect()
+    try:
+        rows = conn.execute(db_handler.ALL_CREWS_SQL).fetchall()
+    finally:
+        conn.close()
+    assert [row[0] for row in rows] == [first, second]
+    for crew_id, *crew_row in rows:
+        assert db_handler.crew_config_from_row(crew_row) == EXPECTED_CREW
+
+def test_list_etag_changes_on_insert_and_delete(client):
+    r = client.get("/crews")
+    assert r.json() == []
+    empty_etag = r.headers["etag"]
+    assert client.get("/crews", headers={"If-None-Match": empty_etag}).status_code == 304
+
+    crew_id = save(client)
+    r = client.get("/crews", headers={"If-None-Match": empty_etag})
+    assert r.status_code == 200
+    assert [crew["crew_id"] for crew in r.json()] == [crew_id]
+    one_etag = r.headers["etag"]
+    assert one_etag != empty_etag
+    assert client.get("/crews", headers={"If-None-Match": one_etag}).status_code == 304
+
+    assert client.delete(f"/crews/{crew_id}").status_code == 200
+    r = client.get("/crews", headers={"If-None-Match": one_etag})
+    assert r.status_code == 200
+    assert r.json() == []
+    assert r.headers["etag"] == empty_etag  # same (empty) list again
+
+class _WriteBeforeListRead:
+    """
+    Wraps a pooled connection; commits a new crew from another connection
+    after list_crews has read the version, just before it reads the list.
+    """
+    def __init__(self, conn, crew_ids):
+        self._conn = conn
+        self._crew_ids = crew_ids
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    async def execute(self, sql, *args):
+        if sql == crews._LIST_CREWS_SQL and not self._crew_ids:
+            other = db_handler.connect()
+            try:
+                self._crew_ids.append(other.execute(
+                    "INSERT INTO crew_metadata (crew_name) VALUES ('Racing crew') RETURNING crew_id"
+                ).fetchone()[0])
+            finally:
+                other.close()
+        return await self._conn.execute(sql, *args)
+
+def test_list_is_not_cached_under_an_older_version(client):
+    first = save(client)
+    racing_ids = []
+
+    async def racing_conn(pool=Depends(get_pool)):
+        async with pool.connection() as conn:
+            yield _WriteBeforeListRead(conn, racing_ids)
+    client.app.dependency_overrides[get_conn] = racing_conn
+    r = client.get("/crews")
+    del client.app.dependency_overrides[get_conn]
+    (racing,) = racing_ids
+    # Version and payload come from the snapshot taken before the write
+    assert [crew["crew_id"] for crew in r.json()] == [first]
+    one_etag = r.headers["etag"]
+
+    r = client.get("/crews", headers={"If-None-Match": one_etag})
+    assert r.status_code == 200
+    assert [crew["crew_id"] for crew in r.json()] == [first, racing]
+
+    # Back to the version cached above: that cache must not hold the racing crew
+    assert client.delete(f"/crews/{racing}").status_code == 200
+    r = client.get("/crews")
+    assert r.headers["etag"] == one_etag
+    assert [crew["crew_id"] for crew in r.json()] == [first]
+
+def test_list_etag_differs_across_recreated_databases(db_path):
+    with make_client((crews.router, "")) as client:
+        save(client)
+        etag = client.get("/crews").headers["etag"]
+    remove_db(db_path)
+
+    # Same count and max crew_id, different crew
+    with make_client((crews.router, "")) as client:
+        save(client, {**CREW_CONFIG, "crew": {**CREW_CONFIG["crew"], "name": "Other crew"}})
+        r = client.get("/crews", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.json()[0]["crew_name"] == "Other crew"
+
+def test_get_crew_revalidates_and_404s_after_delete(client):
+    crew_id = save(client)
+
+    r = client.get(f"/crews/{crew_id}")
+    etag = r.headers["etag"]
+    r = client.get(f"/crews/{crew_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    assert client.delete(f"/crews/{crew_id}").status_code == 200
+    assert client.get(f"/crews/{crew_id}", headers={"If-None-Match": etag}).status_code == 404
+    assert client.get(f"/crews/{crew_id}").status_code == 404
+    assert client.delete(f"/crews/{crew_id}").status_code == 404
+
+def test_get_crew_etag_differs_across_recreated_databases(db_path):
+    with make_client((crews.router, "")) as client:
+        crew_id = save(client)
+        etag = client.get(f"/crews/{crew_id}").headers["etag"]
+    remove_db(db_path)
+
+    # The new database hands out the same id to a different crew
+    with make_client((crews.router, "")) as client:
+        other = {**CREW_CONFIG, "crew": {**CREW_CONFIG["crew"], "name": "Other crew"}}
+        assert save(client, other) == crew_id
+        r = client.get(f"/crews/{crew_id}", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.json()["crew"]["name"] == "Other crew"
+
+def test_delete_removes_children_on_a_database_from_before_the_trigger(db_path):
+    shutil.copyfile(REPO_DB, db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT count(*) FROM sqlite_master WHERE type='trigger'").fetchone() == (0,)
+        (old_id,) = conn.execute("SELECT min(crew_id) FROM crew_metadata").fetchone()
+    finally:
+        conn.close()
+
+    with make_client((crews.router, "")) as client:  # runs init_db
+        new_id = save(client)
+        assert client.delete(f"/crews/{old_id}").status_code == 200
+
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = {
+            table: dict(conn.execute(f"SELECT crew_id, count(*) FROM {table} GROUP BY crew_id"))
+            for table in ("agent", "task")
+        }
+    finally:
+        conn.close()
+    assert old_id not in counts["agent"] and old_id not in counts["task"]
+    assert counts["agent"][new_id] == 2 and counts["task"][new_id] == 2
@@ -0,0 +1,149 @@
+# tests/test_db.py
+import asyncio
+import copy
+import sqlite3
+import time
+
+import pytest
+
+from agent_creator.api import db, db_handler
+from agent_creator.api.routers import crews
+
+from helpers import CREW_CONFIG, make_client, save
+
+def test_pool_connects_to_db_handler_db_path(client, db_path):
+    # Only db_handler.DB_PATH is patched (conftest); the pool must follow it
+    crew_id = save(client)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT crew_id, crew_name FROM crew_metadata").fetchall()
+    finally:
+        conn.close()
+    assert rows == [(crew_id, "Research crew")]
+
+def test_apps_keep_their_own_pools(db_path):
+    with make_client((crews.router, "")) as first:
+        with make_client((crews.router, "")) as second:
+            assert first.app.state.pool is not second.app.state.pool
+            assert second.get("/crews").status_code == 200
+        # Stopping the second app must leave the first one's pool open
+        assert first.get("/crews").status_code == 200
+        save(first)
+        assert len(first.get("/crews").json()) == 1
+
+def test_close_pool_does_not_wait_for_a_free_connection(db_path, monkeypatch):
+    monkeypatch.setattr(db, "POOL_SIZE", 1)
+
+    async def close_while_checked_out():
+        pool = db.open_pool()
+        async with pool.connection():
+            started = time.monotonic()
+            await db.close_pool(pool)
+            return time.monotonic() - started, pool._pool.is_closed
+
+    elapsed, closed = asyncio.run(close_while_checked_out())
+    assert closed
+    assert elapsed < db.OPTIMIZE_TIMEOUT + 1
+
+def test_save_crew_config_reports_every_bad_task_at_once(client):
+    config = copy.deepcopy(CREW_CONFIG)
+    config["tasks"][0]["agent"] = "nobody"
+    del config["tasks"][1]["agent"]
+
+    with pytest.raises(ValueError) as excinfo:
+        save(client, config)
+    message = str(excinfo.value)
+    assert "Task 'draft' references agent 'nobody'" in message
+    assert "Task 'review' has no 'agent' field." in message
+    # Validation runs before the transaction, so nothing was written
+    assert client.get("/crews").json() == []
+
+async def _create_jobs(pool):
+    async with pool.connection() as conn:
+        pending = await db_handler.create_job(conn)
+        running = await db_handler.create_job(conn)
+        await db_handler.update_job(conn, running, "running")
+        done = await db_handler.create_job(conn)
+        await db_handler.update_job(conn, done, "done", crew_id=1)
+    return pending, running, done
+
+async def _get_jobs(pool, job_ids):
+    async with pool.connection() as conn:
+        return [await db_handler.get_job(conn, job_id) for job_id in job_ids]
+
+def _backdate_jobs(db_path, seconds):
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute("UPDATE job SET updated_at = updated_at - ?", (seconds,))
+    finally:
+        conn.close()
+
+def test_starting_a_worker_leaves_live_jobs_alone(db_path, monkeypatch):
+    # Jobs accepted by a sibling worker that is still heartbeating
+    with monkeypatch.context() as m, make_client() as client:
+        m.setattr(db_handler, "BOOT_ID", "sibling")
+        job_ids = client.portal.call(_create_jobs, client.app.state.pool)
+
+    with make_client() as client:  # runs init_db
+        pending, running, done = client.portal.call(_get_jobs, client.app.state.pool, job_ids)
+    assert pending["status"] == "pending" and pending["error"] is None
+    assert running["status"] == "running" and running["error"] is None
+    assert done["status"] == "done"
+
+def test_jobs_of_a_stopped_worker_fail_once_stale(db_path, monkeypatch):
+    with monkeypatch.context() as m, make_client() as client:
+        m.setattr(db_handler, "BOOT_ID", "stopped")
+        job_ids = client.portal.call(_create_jobs, client.app.state.pool)
+    _backdate_jobs(db_path, db_handler.JOB_STALE_AFTER + 1)
+
+    with make_client() as client:
+        pending, running, done = client.portal.call(_get_jobs, client.app.state.pool, job_ids)
+    for job in (pending, running):
+        assert job["status"] == "failed"
+        assert job["error"] == db_handler.INTERRUPTED_JOB_ERROR
+    assert done["status"] == "done" and done["crew_id"] == 1 and done["error"] is None
+
+def test_own_jobs_are_never_failed_as_stale(client, db_path):
+    pending, running, _ = client.portal.call(_create_jobs, client.app.state.pool)
+    _backdate_jobs(db_path, db_handler.JOB_STALE_AFTER + 1)
+
+    pending_job, running_job = client.portal.call(_get_jobs, client.app.state.pool,
+                                                  (pending, running))
+    assert pending_job["status"] == "pending"
+    assert running_job["status"] == "running"
+
+def test_heartbeat_keeps_a_job_fresh(client, db_path, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(db_handler, "BOOT_ID", "other")
+        (job_id, _, _) = client.portal.call(_create_jobs, client.app.state.pool)
+    _backdate_jobs(db_path, db_handler.JOB_STALE_AFTER + 1)
+
+    async def touch(pool):
+        async with pool.connection() as conn:
+            await db_handler.touch_job(conn, job_id)
+    client.portal.call(touch, client.app.state.pool)
+
+    (job,) = client.portal.call(_get_jobs, client.app.state.pool, (job_id,))
+    assert job["status"] == "pending"
+
+def test_polling_a_live_job_does_not_wait_for_the_write_lock(client, db_path):
+    (job_id, _, _) = client.portal.call(_create_jobs, client.app.state.pool)
+
+    writer = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        writer.execute("BEGIN IMMEDIATE")
+
+        async def poll(pool):
+            async with pool.connection() as conn:
+                await conn.execute("PRAGMA busy_timeout=0")
+                try:
+                    return await db_handler.get_job(conn, job_id)
+                finally:
+                    await conn.execute("PRAGMA busy_timeout=5000")
+        job = client.portal.call(poll, client.app.state.pool)
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    assert job["status"] == "pending"
@@ -0,0 +1,104 @@
+# tests/test_jobs.py
+import copy
+
+import pytest
+from fastapi import BackgroundTasks
+
+pytest.importorskip("crewai")
+
+from agent_creator.api.routers import meta_agent
+from agent_creator.api.schemas import MetaAgentInput
+
+from helpers import CREW_CONFIG, FakeMetaCrew, make_client
+
+PAYLOAD = MetaAgentInput(
+    user_description="Research a topic",
+    user_input_description="A topic",
+    user_output_description="A report",
+    user_tools=["search", "scrape"],
+    user_process="sequential",
+    user_planning=False,
+    user_knowledge=False,
+    user_human_input_tasks=False,
+    user_memory=False,
+    user_cache=False,
+)
+
+@pytest.fixture
+def meta_crew(monkeypatch):
+    def install(config):
+        fake = FakeMetaCrew(config)
+        monkeypatch.setattr(meta_agent, "get_meta_crew", lambda: fake)
+        return fake
+    monkeypatch.setattr(meta_agent, "_inflight_jobs", {})
+    return install
+
+@pytest.fixture
+def client(db_path):
+    with make_client((meta_agent.router, "/meta-agent")) as client:
+        yield client
+
+def submit(client, background_tasks, payload=PAYLOAD):
+    pool = client.app.state.pool
+
+    async def run():
+        async with pool.connection() as conn:
+            return await meta_agent.create_crew_job(payload, background_tasks, pool=pool, conn=conn)
+    return client.portal.call(run)
+
+def test_identical_jobs_share_one_run(client, meta_crew):
+    fake = meta_crew(CREW_CONFIG)
+
+    first_tasks, second_tasks = BackgroundTasks(), BackgroundTasks()
+    first = submit(client, first_tasks)
+    # Same tools in another order, with a duplicate: same prompts, same job
+    reordered = PAYLOAD.model_copy(update={"user_tools": ["scrape", "search", "scrape"]})
+    second = submit(client, second_tasks, reordered)
+    assert second["job_id"] == first["job_id"]
+    assert len(first_tasks.tasks) == 1
+    assert second_tasks.tasks == []
+
+    client.portal.call(first_tasks)
+    assert fake.kickoffs == 1
+    assert meta_agent._inflight_jobs == {}
+    job = client.get(f"/meta-agent/jobs/{first['job_id']}").json()
+    assert job["status"] == "done"
+    assert job["crew_id"] is not None
+
+def test_failed_job_releases_inflight_entry(client, meta_crew):
+    bad_config = copy.deepcopy(CREW_CONFIG)
+    bad_config["tasks"][0]["agent"] = "nobody"
+    meta_crew(bad_config)
+
+    background_tasks = BackgroundTasks()
+    first = submit(client, background_tasks)
+    client.portal.call(background_tasks)
+
+    assert meta_agent._inflight_jobs == {}
+    job = client.get(f"/meta-agent/jobs/{first['job_id']}").json()
+    assert job["status"] == "failed"
+    assert "nobody" in job["error"]
+    # The next identical request starts a fresh job
+    assert submit(client, BackgroundTasks())["job_id"] != first["job_id"]
+
+def test_inflight_entry_released_when_marking_running_fails(client, meta_crew, monkeypatch):
+    meta_crew(CREW_CONFIG)
+    update_job = meta_agent.update_job
+
+    async def flaky_update_job(conn, job_id, status, **kwargs):
+        if status == "running":
+            raise RuntimeError("database is locked")
+        await update_job(conn, job_id, status, **kwargs)
+    monkeypatch.setattr(meta_agent, "update_job", flaky_update_job)
+
+    background_tasks = BackgroundTasks()
+    first = submit(client, background_tasks)
+    client.portal.call(background_tasks)
+
+    assert meta_agent._inflight_jobs == {}
+    job = client.get(f"/meta-agent/jobs/{first['job_id']}").json()
+    assert job["status"] == "failed"
+    assert job["error"] == "database is locked"
+
+def test_unknown_job_is_404(client):
+    assert client.get("/meta-agent/jobs/missing").status_code == 404
@@ -0,0 +1,30 @@
+# tests/test_meta_agent.py
+import copy
+
+import pytest
+from fastapi import HTTPException
+
+pytest.importorskip("crewai")
+
+from agent_creator.api.routers import meta_agent
+
+from helpers import CREW_CONFIG, FakeMetaCrew
+
+def test_generate_crew_config_reports_every_problem_at_once(monkeypatch):
+    config = copy.deepcopy(CREW_CONFIG)
+    del config["agents"][1]["name"]
+    config["tasks"][0]["agent"] = "nobody"
+    del config["tasks"][1]["agent"]
+    monkeypatch.setattr(meta_agent, "get_meta_crew", lambda: FakeMetaCrew(config))
+
+    with pytest.raises(HTTPException) as excinfo:
+        meta_agent._generate_crew_config({})
+    assert excinfo.value.status_code == 400
+    detail = excinfo.value.detail
+    assert "Agent with role='Analyst' is missing the 'name' field." in detail
+    assert "Task 'draft' references agent 'nobody' which is not in the agent 'name' list: ['writer']" in detail
+    assert "Task 'review' is missing 'agent' field." in detail
+
+def test_generate_crew_config_passes_a_valid_config_through(monkeypatch):
+    monkeypatch.setattr(meta_agent, "get_meta_crew", lambda: FakeMetaCrew(CREW_CONFIG))
+    assert meta_agent._generate_crew_config({}) == CREW_CONFIG